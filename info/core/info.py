@@ -19,11 +19,14 @@ class info()
   __computeInfo3D()
   __computeInfo3D_conditioned()
   __assemble()
+  allInfo
   normalizeinfo()
 
 equal()
+computeLog()
 computeEntropy()
 computeEntropyKNN()
+countNeighborsKNN()
 computeConditionalInfo()
 computeMI()
 computeCMI()
@@ -39,19 +42,35 @@ Jiang, Peishi, and Praveen Kumar. "Interactions of information transfer along se
 
 import numpy as np
 import pandas as pd
+import scipy
 from scipy.spatial import cKDTree
 from scipy.special import digamma
 from ..utils.pdf_computer import pdf_computer
 from ..utils.knntoolkit import knn_cuda, knn_scipy, knn_sklearn
 # from scipy.stats import entropy
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
 
 kde_approaches = ['kde_c', 'kde_cuda', 'kde_cuda_general']
 knn_approaches = ['knn', 'knn_cuda', 'knn_scipy', 'knn_sklearn']
 
+# Whether cKDTree.query_ball_point supports return_length (scipy >= 1.3) for counting neighbors in one call
+ball_point_length = tuple(int(v) for v in scipy.__version__.split('.')[:2]) >= (1, 3)
+
+# The log of a pdf (or a ratio of pdfs) for numexpr, where the log of any zero or nonfinite value is treated as zero as in computeLog()
+ne_log = 'where(({0} > 0) & ({0} < inf), log({0}), 0)'
+# The elements of I(X;Y) and I(X;Y|W) weighted by the normalized joint pdf p/psum for numexpr
+ne_mi  = '({0} - {1} - {2}) * p / psum'.format(ne_log.format('p'), ne_log.format('px'), ne_log.format('py'))
+ne_cmi = '({0} - {1} - {2}) * p / psum'.format(ne_log.format('(pxy / pw)'), ne_log.format('(px / pw)'),
+                                               ne_log.format('(py / pw)'))
+
 class info(object):
 
     def __init__(self, case, data, approach='kde_c', bandwidth='silverman', kernel='gaussian', k=10,
-                 base=np.e, conditioned=False, specific=False, averaged=True, xyindex=None, deldata=True):
+                 base=np.e, conditioned=False, specific=False, averaged=True, xyindex=None, deldata=True,
+                 marginals=None):
         '''
         Input:
         case        -- the number of dimension to be computed [int]
@@ -68,11 +87,14 @@ class info(object):
                        1D: [xlastind], 2D: [xlastind, ylastind], 3D: [xlastind,ylastind,zlastind]
                        note that xlastind < ylastind < zlastind <= len(pdfs.shape)
                        if None, used for computeInfo*D*
+        marginals   -- the precomputed entropies to be reused instead of being estimated again, used for computeInfo2D*_kde
+                       e.g., {'hx': 1.2, 'hy': 0.8} [dict]
         '''
         self.base        = base
         self.conditioned = conditioned
         self.specific    = specific
         self.averaged    = averaged
+        self.marginals   = marginals if marginals is not None else {}
 
         # Check the dimension of the data
         if len(data.shape) > 2:
@@ -142,8 +164,8 @@ class info(object):
             elif self.case == 3 and conditioned:
                 self.__computeInfo3D_conditioned_knn()
 
-        # Assemble all the information values into a Pandas series format
-        # self.__assemble()
+        # All the information values are assembled into a Pandas series format only when allInfo is requested
+        self.__allInfo = None
 
         if deldata:
             del self.data
@@ -237,10 +259,6 @@ class info(object):
         # Locate the index where rset are zero, and change these values to 1e-14
         rset[rset == 0] = 1e-14
 
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset = dist[:, -1]
-
         # Note that the number of nearest neighbors with ball radius radiusset is always k in the joint dataset
         kset = k*np.ones(npts)
 
@@ -299,18 +317,8 @@ class info(object):
 
         # Get the number of nearest neighbors for X and Y based on the ball radius
         treew, treex = cKDTree(wdata), cKDTree(xdata)
-        kwset = np.array([len(treew.query_ball_point(wdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxset = np.array([len(treex.query_ball_point(xdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset = dist[:, -1][:, np.newaxis]
-
-        # # Get the number of nearest neighbors for X and W based on the ball radius
-        # distw, _ = knn(querypts=wdata, refpts=wdata, k=npts)
-        # distx, _ = knn(querypts=xdata, refpts=xdata, k=npts)
-        # kwset    = np.sum(distw < rset, axis=1)
-        # kxset    = np.sum(distx < rset, axis=1)
+        kwset = countNeighborsKNN(treew, wdata, rset)
+        kxset = countNeighborsKNN(treex, xdata, rset)
 
         # Note that the number of nearest neighbors with ball radius rset for XW is always k in the joint dataset
         kset = k*np.ones(npts)
@@ -325,24 +333,15 @@ class info(object):
         '''
         Compute H(X), H(Y), H(X|Y), H(Y|X), I(X;Y) using KNN method
         '''
-        base     = self.base
         data     = self.data
-        computer = self.computer
-        averaged = self.averaged
         npts, ndim = data.shape
 
         xlastind = self.xlastind
 
-        # Compute the pdfs
-        _, pdfs  = computer.computePDF(data)
-        _, xpdfs = computer.computePDF(data[:,range(0,xlastind)])
-        _, ypdfs = computer.computePDF(data[:,range(xlastind,ndim)])
-
         # Compute H(X), H(Y) and H(X,Y)
-        # print xpdfs
-        self.hx  = computeEntropy(xpdfs, base=base, averaged=averaged)  # H(X)
-        self.hy  = computeEntropy(ypdfs, base=base, averaged=averaged)  # H(Y)
-        self.hxy = computeEntropy(pdfs, base=base, averaged=averaged)   # H(X,Y)
+        self.hx  = self.__computeEntropy_kde('hx', data[:,range(0,xlastind)])     # H(X)
+        self.hy  = self.__computeEntropy_kde('hy', data[:,range(xlastind,ndim)])  # H(Y)
+        self.hxy = self.__computeEntropy_kde('hxy', data)                          # H(X,Y)
         self.hy_x = self.hxy - self.hx                                  # H(Y|X)
         self.hx_y = self.hxy - self.hy                                  # H(X|Y)
         self.ixy  = self.hx + self.hy - self.hxy                        # I(X;Y)
@@ -379,26 +378,12 @@ class info(object):
 
         # Get the number of nearest neighbors for X and Y based on the ball radius
         treey, treex = cKDTree(ydata), cKDTree(xdata)
-        kyset = np.array([len(treey.query_ball_point(ydata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxset = np.array([len(treex.query_ball_point(xdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset    = dist[:, -1][:, np.newaxis]
-
-        # # Get the number of nearest neighbors for X and Y based on the ball radius
-        # disty, _ = knn(querypts=ydata, refpts=ydata, k=npts)
-        # distx, _ = knn(querypts=xdata, refpts=xdata, k=npts)
-        # kyset    = np.sum(disty < rset, axis=1)
-        # kxset    = np.sum(distx < rset, axis=1)
+        kyset = countNeighborsKNN(treey, ydata, rset)
+        kxset = countNeighborsKNN(treex, xdata, rset)
 
         # Note that the number of nearest neighbors with ball radius rset for XW is always k in the joint dataset
         kset = k*np.ones(npts)
 
-        # Compute the k-digamma term
-        # from scipy.special import digamma
-        # print digamma(npts) + digamma(k) - np.mean(digamma(kyset)) - np.mean(digamma(kxset))
-
         # Compute information metrics
         self.hxy  = computeEntropyKNN(npts, ndim, kset, rset, base)
         self.hy   = computeEntropyKNN(npts, yndim, kyset, rset, base)
@@ -411,31 +396,19 @@ class info(object):
         '''
         Compute H(X|W), H(Y|W), H(X,Y|W), I(X,Y|W)
         '''
-        base       = self.base
         data       = self.data
-        computer   = self.computer
-        averaged   = self.averaged
         npts, ndim = data.shape
 
         xlastind, ylastind = self.xlastind, self.ylastind
 
-        # Compute the pdfs
-        _, pdfs  = computer.computePDF(data)
-        _, xpdfs  = computer.computePDF(data[:,range(0,xlastind)])
-        _, ypdfs  = computer.computePDF(data[:,range(xlastind,ylastind)])
-        _, wpdfs  = computer.computePDF(data[:,range(ylastind,ndim)])
-        _, xypdfs = computer.computePDF(data[:,range(0,ylastind)])
-        _, xwpdfs = computer.computePDF(data[:,range(0,xlastind)+range(ylastind,ndim)])
-        _, ywpdfs = computer.computePDF(data[:,range(xlastind,ndim)])
-
         # Compute all the entropies
-        self.hw    = computeEntropy(wpdfs, base=base, averaged=averaged)    # h(w)
-        self.hx    = computeEntropy(xpdfs, base=base, averaged=averaged)    # h(x)
-        self.hy    = computeEntropy(ypdfs, base=base, averaged=averaged)    # h(y)
-        self.hxy   = computeEntropy(xypdfs, base=base, averaged=averaged)   # h(x,y)
-        self.hxw   = computeEntropy(xwpdfs, base=base, averaged=averaged)   # h(x,w)
-        self.hyw   = computeEntropy(ywpdfs, base=base, averaged=averaged)   # h(y,w)
-        self.hxyw  = computeEntropy(pdfs, base=base, averaged=averaged)     # h(x,y,w)
+        self.hw    = self.__computeEntropy_kde('hw', data[:,range(ylastind,ndim)])                            # h(w)
+        self.hx    = self.__computeEntropy_kde('hx', data[:,range(0,xlastind)])                               # h(x)
+        self.hy    = self.__computeEntropy_kde('hy', data[:,range(xlastind,ylastind)])                        # h(y)
+        self.hxy   = self.__computeEntropy_kde('hxy', data[:,range(0,ylastind)])                              # h(x,y)
+        self.hxw   = self.__computeEntropy_kde('hxw', data[:,range(0,xlastind)+range(ylastind,ndim)])         # h(x,w)
+        self.hyw   = self.__computeEntropy_kde('hyw', data[:,range(xlastind,ndim)])                           # h(y,w)
+        self.hxyw  = self.__computeEntropy_kde('hxyw', data)                                                  # h(x,y,w)
         self.hx_w  = self.hxw - self.hw                                     # h(x|w)
         self.hy_w  = self.hyw - self.hw                                     # h(y|w)
         self.hx_y  = self.hxy - self.hy                                     # h(x|y)
@@ -475,28 +448,13 @@ class info(object):
 
         # Get the number of nearest neighbors for X and Y based on the ball radius
         treeyw, treexw, treew = cKDTree(ywdata), cKDTree(xwdata), cKDTree(wdata)
-        kywset = np.array([len(treeyw.query_ball_point(ywdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxwset = np.array([len(treexw.query_ball_point(xwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kwset  = np.array([len(treew.query_ball_point(wdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset    = dist[:, -1][:, np.newaxis]
-
-        # # Get the number of nearest neighbors for X and Y based on the ball radius
-        # distyw, _ = knn(querypts=ywdata, refpts=ywdata, k=npts)
-        # distxw, _ = knn(querypts=xwdata, refpts=xwdata, k=npts)
-        # distw, _  = knn(querypts=wdata, refpts=wdata, k=npts)
-        # kywset    = np.sum(distyw < rset, axis=1)
-        # kxwset    = np.sum(distxw < rset, axis=1)
-        # kwset     = np.sum(distw < rset, axis=1)
+        kywset = countNeighborsKNN(treeyw, ywdata, rset)
+        kxwset = countNeighborsKNN(treexw, xwdata, rset)
+        kwset  = countNeighborsKNN(treew, wdata, rset)
 
         # Note that the number of nearest neighbors with ball radius rset for XW is always k in the joint dataset
         kset = k*np.ones(npts)
 
-        # from scipy.special import digamma
-        # print np.mean(digamma(kwset)), digamma(k), np.mean(digamma(kywset)), np.mean(digamma(kxwset))
-
         # Compute information metrics
         self.hw   = computeEntropyKNN(npts, wndim, kwset, rset, base)
         self.hxw  = computeEntropyKNN(npts, xndim+wndim, kxwset, rset, base)
@@ -526,12 +484,6 @@ class info(object):
         _, xypdfs = computer.computePDF(data[:,range(0,ylastind)])
         _, xzpdfs = computer.computePDF(data[:,range(0,xlastind)+range(ylastind,ndim)])
         _, yzpdfs = computer.computePDF(data[:,range(xlastind,ndim)])
-        # _, xpdfs  = computer.computePDF(data[:,[0]])
-        # _, ypdfs  = computer.computePDF(data[:,[1]])
-        # _, zpdfs  = computer.computePDF(data[:,[2]])
-        # _, xypdfs = computer.computePDF(data[:,[0,1]])
-        # _, xzpdfs = computer.computePDF(data[:,[0,2]])
-        # _, yzpdfs = computer.computePDF(data[:,[1,2]])
 
         # Compute H(X), H(Y) and H(Z)
         self.hx   = computeEntropy(xpdfs, base=base, averaged=averaged)   # H(X)
@@ -600,19 +552,6 @@ class info(object):
         _, xywpdfs = computer.computePDF(data[:,range(0,ylastind)+range(zlastind,ndim)])
         _, yzwpdfs = computer.computePDF(data[:,range(xlastind,ndim)])
         _, xzwpdfs = computer.computePDF(data[:,range(0,xlastind)+range(ylastind,ndim)])
-        # _, xpdfs   = computer.computePDF(data[:,[0]])
-        # _, ypdfs   = computer.computePDF(data[:,[1]])
-        # _, zpdfs   = computer.computePDF(data[:,[2]])
-        # _, wpdfs   = computer.computePDF(data[:,3:])
-        # _, xypdfs  = computer.computePDF(data[:,[0,1]])
-        # _, xzpdfs  = computer.computePDF(data[:,[0,2]])
-        # _, yzpdfs  = computer.computePDF(data[:,[1,2]])
-        # _, xwpdfs  = computer.computePDF(data[:,[0]+range(3,ndim)])
-        # _, ywpdfs  = computer.computePDF(data[:,[1]+range(3,ndim)])
-        # _, zwpdfs  = computer.computePDF(data[:,[2]+range(3,ndim)])
-        # _, xywpdfs = computer.computePDF(data[:,[0,1]+range(3,ndim)])
-        # _, yzwpdfs = computer.computePDF(data[:,[1,2]+range(3,ndim)])
-        # _, xzwpdfs = computer.computePDF(data[:,[0,2]+range(3,ndim)])
 
         # Compute all the entropies
         self.hw    = computeEntropy(wpdfs, base=base, averaged=averaged)    # H(W)
@@ -701,38 +640,16 @@ class info(object):
         # Get the number of nearest neighbors for X and Y based on the ball radius
         treey, treex, treez    = cKDTree(ydata), cKDTree(xdata), cKDTree(zdata)
         treexy, treexz, treeyz = cKDTree(xydata), cKDTree(xzdata), cKDTree(yzdata)
-        kyset = np.array([len(treey.query_ball_point(ydata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxset = np.array([len(treex.query_ball_point(xdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kzset = np.array([len(treez.query_ball_point(zdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxyset = np.array([len(treexy.query_ball_point(xydata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxzset = np.array([len(treexz.query_ball_point(xzdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kyzset = np.array([len(treeyz.query_ball_point(yzdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset    = dist[:, -1][:, np.newaxis]
-
-        # # Get the number of nearest neighbors for X, Y, Z, XY, YZ, and XZ based on the ball radius
-        # disty, _  = knn(querypts=ydata, refpts=ydata, k=npts)
-        # distx, _  = knn(querypts=xdata, refpts=xdata, k=npts)
-        # distz, _  = knn(querypts=zdata, refpts=zdata, k=npts)
-        # distxy, _ = knn(querypts=xydata, refpts=xydata, k=npts)
-        # distxz, _ = knn(querypts=xzdata, refpts=xzdata, k=npts)
-        # distyz, _ = knn(querypts=yzdata, refpts=yzdata, k=npts)
-        # kyset     = np.sum(disty < rset, axis=1)
-        # kxset     = np.sum(distx < rset, axis=1)
-        # kzset     = np.sum(distz < rset, axis=1)
-        # kxyset    = np.sum(distxy < rset, axis=1)
-        # kxzset    = np.sum(distxz < rset, axis=1)
-        # kyzset    = np.sum(distyz < rset, axis=1)
+        kyset = countNeighborsKNN(treey, ydata, rset)
+        kxset = countNeighborsKNN(treex, xdata, rset)
+        kzset = countNeighborsKNN(treez, zdata, rset)
+        kxyset = countNeighborsKNN(treexy, xydata, rset)
+        kxzset = countNeighborsKNN(treexz, xzdata, rset)
+        kyzset = countNeighborsKNN(treeyz, yzdata, rset)
 
         # Note that the number of nearest neighbors with ball radius rset for XW is always k in the joint dataset
         kset = k*np.ones(npts)
 
-        # Compute the k-digamma term
-        # from scipy.special import digamma
-        # print digamma(npts) + digamma(k) - np.mean(digamma(kyset)) - np.mean(digamma(kxset))
-
         # Compute information metrics
         self.hxyz = computeEntropyKNN(npts, ndim, kset, rset, base)
         self.hxy  = computeEntropyKNN(npts, xyndim, kxyset, rset, base)
@@ -820,55 +737,20 @@ class info(object):
         treey, treex, treez, treew = cKDTree(ydata), cKDTree(xdata), cKDTree(zdata), cKDTree(wdata)
         treexw, treeyw, treezw     = cKDTree(xwdata), cKDTree(ywdata), cKDTree(zwdata)
         treexyw, treeyzw, treexzw  = cKDTree(xywdata), cKDTree(yzwdata), cKDTree(xzwdata)
-        kyset = np.array([len(treey.query_ball_point(ydata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxset = np.array([len(treex.query_ball_point(xdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kzset = np.array([len(treez.query_ball_point(zdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kwset = np.array([len(treew.query_ball_point(wdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxwset = np.array([len(treexw.query_ball_point(xwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kywset = np.array([len(treeyw.query_ball_point(ywdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kzwset = np.array([len(treezw.query_ball_point(zwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxywset = np.array([len(treexyw.query_ball_point(xywdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kyzwset = np.array([len(treeyzw.query_ball_point(yzwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-        kxzwset = np.array([len(treexzw.query_ball_point(xzwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-        # # Compute the ball radius of the k nearest neighbor for each data point
-        # dist, _ = knn(querypts=data, refpts=data, k=k+1)
-        # rset    = dist[:, -1][:, np.newaxis]
-
-        # # Get the number of nearest neighbors for X, Y, Z, XY, YZ, and XZ based on the ball radius
-        # disty, _  = knn(querypts=ydata, refpts=ydata, k=npts)
-        # distx, _  = knn(querypts=xdata, refpts=xdata, k=npts)
-        # distz, _  = knn(querypts=zdata, refpts=zdata, k=npts)
-        # distw, _  = knn(querypts=wdata, refpts=wdata, k=npts)
-        # # distxy, _ = knn(querypts=xydata, refpts=xydata, k=npts)
-        # # distxz, _ = knn(querypts=xzdata, refpts=xzdata, k=npts)
-        # # distyz, _ = knn(querypts=yzdata, refpts=yzdata, k=npts)
-        # distxw, _ = knn(querypts=xwdata, refpts=xwdata, k=npts)
-        # distyw, _ = knn(querypts=ywdata, refpts=ywdata, k=npts)
-        # distzw, _ = knn(querypts=zwdata, refpts=zwdata, k=npts)
-        # distxyw, _ = knn(querypts=xywdata, refpts=xywdata, k=npts)
-        # distyzw, _ = knn(querypts=yzwdata, refpts=yzwdata, k=npts)
-        # distxzw, _ = knn(querypts=xzwdata, refpts=xzwdata, k=npts)
-        # kyset     = np.sum(disty < rset, axis=1)
-        # kxset     = np.sum(distx < rset, axis=1)
-        # kzset     = np.sum(distz < rset, axis=1)
-        # # kxyset    = np.sum(distxy < rset, axis=1)
-        # # kxzset    = np.sum(distxz < rset, axis=1)
-        # # kyzset    = np.sum(distyz < rset, axis=1)
-        # kxwset    = np.sum(distxw < rset, axis=1)
-        # kywset    = np.sum(distyw < rset, axis=1)
-        # kzwset    = np.sum(distzw < rset, axis=1)
-        # kxywset   = np.sum(distxyw < rset, axis=1)
-        # kyzwset   = np.sum(distyzw < rset, axis=1)
-        # kxzwset   = np.sum(distxzw < rset, axis=1)
+        kyset = countNeighborsKNN(treey, ydata, rset)
+        kxset = countNeighborsKNN(treex, xdata, rset)
+        kzset = countNeighborsKNN(treez, zdata, rset)
+        kwset = countNeighborsKNN(treew, wdata, rset)
+        kxwset = countNeighborsKNN(treexw, xwdata, rset)
+        kywset = countNeighborsKNN(treeyw, ywdata, rset)
+        kzwset = countNeighborsKNN(treezw, zwdata, rset)
+        kxywset = countNeighborsKNN(treexyw, xywdata, rset)
+        kyzwset = countNeighborsKNN(treeyzw, yzwdata, rset)
+        kxzwset = countNeighborsKNN(treexzw, xzwdata, rset)
 
         # Note that the number of nearest neighbors with ball radius rset for XW is always k in the joint dataset
         kset = k*np.ones(npts)
 
-        # Compute the k-digamma term
-        # from scipy.special import digamma
-        # print digamma(npts) + digamma(k) - np.mean(digamma(kyset)) - np.mean(digamma(kxset))
-
         # Compute information metrics
         self.hxyzw = computeEntropyKNN(npts, ndim, kset, rset, base)
         self.hxyw = computeEntropyKNN(npts, xywndim, kxywset, rset, base)
@@ -909,6 +791,21 @@ class info(object):
         self.uxz = self.ixz_w - self.r                                      # U(X;Z|W)
         self.uyz = self.iyz_w - self.r                                      # U(Y;Z|W)
 
+    def __computeEntropy_kde(self, name, data):
+        '''
+        Compute the entropy of data by using KDE, unless it is given in the precomputed marginals.
+        Input:
+        name -- the name of the entropy in the marginals, e.g., 'hx' [string]
+        data -- the data [numpy array with shape (npoints, ndim)]
+        Output: the entropy [float]
+        '''
+        if name in self.marginals:
+            return self.marginals[name]
+
+        _, pdfs = self.computer.computePDF(data)
+
+        return computeEntropy(pdfs, base=self.base, averaged=self.averaged)
+
     def __assemble(self):
         '''
         Assemble all the information values into a Pandas series format
@@ -940,6 +837,17 @@ class info(object):
                                      index=['I(X;Z|W)', 'I(Y;Z|W)', 'I(X,Y;Z|W)', 'II', 'R(Z;Y,X|W)', 'S(Z;Y,X|W)', 'U(Z,X|W)', 'U(Z,Y|W)', 'Rmin', 'Isource', 'RMMI'],
                                      name='ordinary')
 
+    @property
+    def allInfo(self):
+        '''All the information values in a Pandas series format, assembled at the first request.'''
+        if self.__allInfo is None:
+            self.__assemble()
+        return self.__allInfo
+
+    @allInfo.setter
+    def allInfo(self, value):
+        self.__allInfo = value
+
     def normalizeinfo(self):
         """
         Normalize the calculated information metrics in terms of both percentage and magnitude.
@@ -1117,7 +1025,7 @@ class info(object):
                                   name='norm_m')
 
         # Assemble all the information metrics
-        if self.ndim == 1 and not self.conditioned:
+        if self.case == 1 and not self.conditioned:
             self.allInfo = pd.concat([self.allInfo, norm_df], axis=1)
         else:
             self.allInfo = pd.concat([self.allInfo, norm_p_df, norm_m_df], axis=1)
@@ -1130,21 +1038,24 @@ def equal(a, b, e=1e-10):
     '''Check whether the two numbers are equal'''
     return np.abs(a - b) < e
 
+def computeLog(pdfs):
+    '''Compute the natural log of pdf and treat the log of zero (or of an invalid ratio of pdfs) as zero.'''
+    return np.log(pdfs, out=np.zeros(np.shape(pdfs)), where=np.isfinite(pdfs) & (pdfs > 0))
+
 def computeEntropy(pdfs, base=2, averaged=True):
     '''Compute the entropy H(X).'''
     # normalize pdf if not averaged
     if not averaged:
         pdfs = pdfs / np.sum(pdfs)
 
-    # Calculate the log of pdf
-    pdfs_log = np.ma.log(pdfs)
-    pdfs_log = pdfs_log.filled(0) / np.log(base)
+    # Calculate the log of pdf and treat log(0) as zero
+    pdfs_log = computeLog(pdfs)
 
-    # Calculate H(X)
+    # Calculate H(X) (the logrithmatic base is applied after the reduction)
     if averaged:
-        return -np.mean(pdfs_log)
+        return -np.mean(pdfs_log) / np.log(base)
     elif not averaged:
-        return -np.sum(pdfs*pdfs_log)
+        return -np.sum(pdfs*pdfs_log) / np.log(base)
 
 def computeEntropyKNN(npts, ndim, kset, radiusset, base=np.e):
     '''
@@ -1161,23 +1072,35 @@ def computeEntropyKNN(npts, ndim, kset, radiusset, base=np.e):
     from scipy.special import digamma
 
     # Compute the volumn of ndim dimension (maximum norm)
-    # vdx = 2.**ndim
     vdx = 1.
 
     # Compute the radius term
-    # pdfs_log  = np.ma.log(pdfs)
-    # pdfs_log  = pdfs_log.filled(0) / np.log(base)
-    # rd = np.mean(np.log(radiusset + np.finfo('float').eps) / np.log(base))*ndim
-    rd = np.mean(np.log(radiusset) / np.log(base))*ndim
+    rd = np.mean(np.log(radiusset))*ndim / np.log(base)
 
     # Compute the k-digamma term
     kd = np.mean(digamma(kset))
 
     # Compute the entropy
-    # print radiusset[-1]
-    # print digamma(npts), kd, rd
     return digamma(npts) - kd + rd + np.log(vdx) / np.log(base)
 
+def countNeighborsKNN(tree, data, radiusset):
+    '''
+    Count the number of neighbors of each data point strictly within its ball radius (maximum norm).
+    All the data points are queried at once so that the loop over them runs inside the KD tree,
+    if the installed scipy supports return_length (scipy >= 1.3); otherwise they are queried one by one.
+    Inputs:
+    tree      -- the KD tree of the data [cKDTree]
+    data      -- the data [a numpy array with shape (npts, ndim)]
+    radiusset -- the ball radius for each data points [a numpy array with shape (npts, 1)]
+    Output:
+    the number of neighbors for each data point [a numpy array with shape (npts,)]
+    '''
+    radius = radiusset[:,0]-1e-15
+    if ball_point_length:
+        return tree.query_ball_point(data, radius, p=float('inf'), return_length=True)
+    else:
+        return np.array([len(tree.query_ball_point(data[i,:], radius[i], p=float('inf'))) for i in range(data.shape[0])])
+
 def computeConditionalInfo(xpdfs, ypdfs, xypdfs, base=2):
     '''
     Compute the conditional information H(Y|X)
@@ -1188,26 +1111,21 @@ def computeConditionalInfo(xpdfs, ypdfs, xypdfs, base=2):
     Output:
     the coonditional information [float]
     '''
-    nx, ny = xypdfs.shape
-
-    xpdfs1d = np.copy(xpdfs)
+    # Calculate p(y|x) = p(x,y)/p(x) by broadcasting p(x) along y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ypdfs_x = xypdfs / xpdfs[:, np.newaxis]
 
-    # Expand xpdfs and ypdfs into shape (nx, ny)
-    xpdfs = np.tile(xpdfs[:, np.newaxis], [1, ny])
-    ypdfs = np.tile(ypdfs[np.newaxis, :], [nx, 1])
+    # Treat the invalid p(y|x) where p(x) is zero as zero
+    ypdfs_x[~np.isfinite(ypdfs_x)] = 0.
 
-    # Calculate the log of p(x,y)/p(x) and treat log(0) as zero
-    ypdfs_x_log, ypdfs_x = np.ma.log(xypdfs/xpdfs), np.ma.divide(xypdfs, xpdfs)
-    ypdfs_x_log, ypdfs_x = ypdfs_x_log.filled(0), ypdfs_x.filled(0)
-
-    # Get the each info element in H(Y|X=x)
-    hy_x_xy = - ypdfs_x * ypdfs_x_log / np.log(base)
+    # Get the each info element in H(Y|X=x) and treat 0*log(0) as zero
+    hy_x_xy = -ypdfs_x*computeLog(ypdfs_x)
 
     # Sum hxy_xy over y to get H(Y|X=x)
     hy_x_x = np.sum(hy_x_xy, axis=1)
 
     # Calculate H(Y|X)
-    return np.sum(xpdfs1d*hy_x_x)
+    return np.sum(xpdfs*hy_x_x) / np.log(base)
 
 def computeMI(data, approach='kde_c', bandwidth='silverman', kernel='gaussian', base=2, xyindex=None):
     '''
@@ -1243,18 +1161,21 @@ def computeMI(data, approach='kde_c', bandwidth='silverman', kernel='gaussian',
         _, xpdfs = computer.computePDF(data[:,[0]])
         _, ypdfs = computer.computePDF(data[:,[1]])
 
+    # Calculate the log of pdf blockwise without the temporary arrays if numexpr is available
+    if ne is not None:
+        mi_elements = ne.evaluate(ne_mi, local_dict={'p': pdfs, 'px': xpdfs, 'py': ypdfs,
+                                                     'psum': np.sum(pdfs), 'inf': np.inf})
+        return np.sum(mi_elements) / np.log(base)
+
     # Normalize PDF
     pdfsn = pdfs / np.sum(pdfs)
 
     # Calculate the log of pdf
-    pdfs_log  = np.ma.log(pdfs)
-    pdfs_log  = pdfs_log.filled(0) / np.log(base)
-    xpdfs_log = np.ma.log(xpdfs)
-    xpdfs_log = xpdfs_log.filled(0) / np.log(base)
-    ypdfs_log = np.ma.log(ypdfs)
-    ypdfs_log = ypdfs_log.filled(0) / np.log(base)
+    pdfs_log  = computeLog(pdfs)
+    xpdfs_log = computeLog(xpdfs)
+    ypdfs_log = computeLog(ypdfs)
 
-    return np.sum((pdfs_log - xpdfs_log - ypdfs_log)*pdfsn)
+    return np.sum((pdfs_log - xpdfs_log - ypdfs_log)*pdfsn) / np.log(base)
 
 def computeCMI(data, approach='kde_c', bandwidth='silverman', kernel='gaussian', base=2, xyindex=None):
     '''
@@ -1287,30 +1208,33 @@ def computeCMI(data, approach='kde_c', bandwidth='silverman', kernel='gaussian',
         _, ypdfs  = computer.computePDF(data[:,range(xlastind,ylastind)])
         _, wpdfs  = computer.computePDF(data[:,range(ylastind,ndim)])
         _, xypdfs = computer.computePDF(data[:,range(0,ylastind)])
-        # _, xwpdfs = computer.computePDF(data[:,range(0,xlastind)+range(ylastind,ndim)])
-        # _, ywpdfs = computer.computePDF(data[:,range(xlastind,ndim)])
     else:
         _, pdfs  = computer.computePDF(data)
         _, xpdfs = computer.computePDF(data[:,[0]])
         _, ypdfs = computer.computePDF(data[:,[1]])
         _, wpdfs  = computer.computePDF(data[:,2:])
         _, xypdfs = computer.computePDF(data[:,[0,1]])
-    xy_wpdfs  = xypdfs / wpdfs
-    x_wpdfs   = xpdfs / wpdfs
-    y_wpdfs   = ypdfs / wpdfs
+
+    # Calculate the log of the pdf ratios blockwise without the temporary arrays if numexpr is available
+    if ne is not None:
+        cmi_elements = ne.evaluate(ne_cmi, local_dict={'p': pdfs, 'px': xpdfs, 'py': ypdfs, 'pw': wpdfs, 'pxy': xypdfs,
+                                                       'psum': np.sum(pdfs), 'inf': np.inf})
+        return np.sum(cmi_elements) / np.log(base)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xy_wpdfs  = xypdfs / wpdfs
+        x_wpdfs   = xpdfs / wpdfs
+        y_wpdfs   = ypdfs / wpdfs
 
     # Normalize PDF
     pdfsn = pdfs / np.sum(pdfs)
 
     # Calculate the log of pdf
-    pdfs_log  = np.ma.log(xy_wpdfs)
-    pdfs_log  = pdfs_log.filled(0) / np.log(base)
-    xpdfs_log = np.ma.log(x_wpdfs)
-    xpdfs_log = xpdfs_log.filled(0) / np.log(base)
-    ypdfs_log = np.ma.log(y_wpdfs)
-    ypdfs_log = ypdfs_log.filled(0) / np.log(base)
+    pdfs_log  = computeLog(xy_wpdfs)
+    xpdfs_log = computeLog(x_wpdfs)
+    ypdfs_log = computeLog(y_wpdfs)
 
-    return np.sum((pdfs_log - xpdfs_log - ypdfs_log)*pdfsn)
+    return np.sum((pdfs_log - xpdfs_log - ypdfs_log)*pdfsn) / np.log(base)
 
 def computeMIKNN(data, k=2, xyindex=[1]):
     '''
@@ -1342,20 +1266,8 @@ def computeMIKNN(data, k=2, xyindex=[1]):
 
     # Get the number of nearest neighbors for X and Y based on the ball radius
     treey, treex = cKDTree(ydata), cKDTree(xdata)
-    kyset = np.array([len(treey.query_ball_point(ydata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-    kxset = np.array([len(treex.query_ball_point(xdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-
-    # print np.mean(digamma(kwset)), digamma(k), np.mean(digamma(kywset)), np.mean(digamma(kxwset))
-    # print kyset
-    # print rset
-    # print np.where(np.isinf(-digamma(kyset)))
-    # print kyset[np.isinf(-digamma(kyset))]
-    # print ind[np.isinf(-digamma(kyset)), :]
-    # print rset[np.isinf(-digamma(kyset)), :]
-
-    # Locate the index where ky and kx are zero, and change these values to the corresponding duplicated number
-    # kyset[np.isinf(-digamma(kyset))] = 1
-    # kxset[np.isinf(-digamma(kxset))] = 1
+    kyset = countNeighborsKNN(treey, ydata, rset)
+    kxset = countNeighborsKNN(treex, xdata, rset)
 
     # Compute information metrics
     return digamma(npts) + digamma(k) - np.mean(digamma(kyset)) - np.mean(digamma(kxset))
@@ -1391,10 +1303,9 @@ def computeCMIKNN(data, k=2, xyindex=[1,2]):
 
     # Get the number of nearest neighbors for X and Y based on the ball radius
     treeyw, treexw, treew = cKDTree(ywdata), cKDTree(xwdata), cKDTree(wdata)
-    kywset = np.array([len(treeyw.query_ball_point(ywdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-    kxwset = np.array([len(treexw.query_ball_point(xwdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
-    kwset  = np.array([len(treew.query_ball_point(wdata[i,:], rset[i]-1e-15, p=float('inf'))) for i in range(npts)])
+    kywset = countNeighborsKNN(treeyw, ywdata, rset)
+    kxwset = countNeighborsKNN(treexw, xwdata, rset)
+    kwset  = countNeighborsKNN(treew, wdata, rset)
 
-    # print np.mean(digamma(kwset)), digamma(k), np.mean(digamma(kywset)), np.mean(digamma(kxwset))
     # Compute information metrics
     return np.mean(digamma(kwset)) + digamma(k) - np.mean(digamma(kywset)) - np.mean(digamma(kxwset))
@@ -5,6 +5,7 @@ causal network.
 class info_network()
     __init__()
     __approximate_causalDict()
+    __sst()
     update_causalDict()
     update_causalDict_thres()
     udpate_causalDict_one()
@@ -34,7 +35,7 @@ class info_network()
     compute_cit_set()
     compute_cit_Markov_set()
 
-intersection()
+computeLagfunction()
 
 References:
 Schreiber, Thomas. "Measuring information transfer." Physical review letters 85.2 (2000): 461.
@@ -48,6 +49,11 @@ Jiang, Peishi, and Praveen Kumar. "Bundled causal history interaction" submitted
 
 import numpy as np
 from copy import deepcopy
+from multiprocessing import Pool
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
 from .info import info, computeMI, computeCMI, computeMIKNN, computeCMIKNN
 from ..utils.causal_network import causal_network
 from ..utils.others import reorganize_data, dropna
@@ -68,7 +74,8 @@ class info_network(object):
                  k=5,                # parameters for KNN
                  weightPostive=False,
                  causalApprox=False,
-                 base=np.e):
+                 base=np.e,
+                 nprocess=1):
         """
         Input:
         data         -- the data [numpy array with shape (npoints, ndim)]
@@ -83,6 +90,11 @@ class info_network(object):
         approach     -- the selected approach for computing PDF [string]
         causalApprox -- indicate whether the approximation of the graph is computed [bool]
         base         -- the logrithmatic base [float]
+        nprocess     -- the number of processes for computing the lag functions [int]
+
+        Note that the significance tests (sst=True) are cached per instance by the tested nodes and
+        settings, so calling a compute_* method again with sst=True returns the same shuffle results
+        instead of running a new permutation test. Create a new info_network for an independent test.
 
         """
         self.data   = data
@@ -92,6 +104,10 @@ class info_network(object):
         self.kernel = kernel
         self.k      = k
         self.causalApprox = causalApprox
+        self.nprocess = int(nprocess)
+
+        # The results of the significance tests, which only depend on the data and the tested nodes
+        self.__sstcache = {}
 
         # Check whether the number of variables are larger than 1
         self.npoint, self.nvar = data.shape
@@ -109,7 +125,7 @@ class info_network(object):
             self.__approximate_causalDict()
 
         # raise Exception('hellow')
-        self.network    = causal_network(causalDict, lagfuncs, taumax)
+        self.network    = causal_network(self.causalDict, lagfuncs, taumax)
         self.nnode      = self.network.nnodes
         if self.network.nvar != self.nvar:
             raise Exception('The numbers of variables in data and the causalDict are not equal!')
@@ -124,20 +140,12 @@ class info_network(object):
 
         # Generate the latest causalDict
         for j in range(N):
-            pa_old = causalDict[j]
-            pa_new = []
-            for i in range(N):
-                # Get the parents starting from i
-                pa_old_i = [pa for pa in pa_old if pa[0] == i]
+            # Get the smallest lag of the parents starting from each i in a single pass
+            taumin = {}
+            for i, lag in causalDict[j]:
+                taumin[i] = min(taumin.get(i, -lag), -lag)
 
-                # If pa_old_i is empty, continue
-                if len(pa_old_i) == 0: continue
-
-                # Else, get the pa with the smallest lag in pa_old_i as pa_new_i
-                taumin = min([-pa[1] for pa in pa_old_i])
-                pa_new += [(i, -taumin)]
-
-            newcausalDict[j] = pa_new
+            newcausalDict[j] = [(i, -taumin[i]) for i in sorted(taumin)]
 
         if verbosity:
             print("")
@@ -148,6 +156,27 @@ class info_network(object):
         # Update causalDict
         self.causalDict = newcausalDict
 
+    def __sst(self, test, *nodes, **kwargs):
+        """
+        Conduct the significance test on the nodes, or reuse its result if the same test has been conducted.
+
+        Input:
+        test   -- the significance test in utils.sst [function]
+        nodes  -- the nodes or the lists of nodes passed to the test [tuple or list of tuples]
+        kwargs -- the other arguments passed to the test, e.g., conditionset [dict]
+
+        """
+        hashable = lambda v: tuple(v) if isinstance(v, list) else v
+        key = (test.__name__, self.approach, self.k, self.kernel, self.base) + \
+              tuple(hashable(v) for v in nodes) + \
+              tuple((name, hashable(v)) for name, v in sorted(kwargs.items()))
+
+        if key not in self.__sstcache:
+            self.__sstcache[key] = test(*nodes, data=self.data, approach=self.approach, k=self.k,
+                                        kernel=self.kernel, base=self.base, **kwargs)
+
+        return self.__sstcache[key]
+
     def update_causalDict(self, causalDict, verbosity=1):
         """Update the causalDict."""
         # Update causalDict
@@ -175,15 +204,13 @@ class info_network(object):
             self.generate_lagfunctions()
 
         # Generate the latest causalDict
+        # by looking up each original parent in the slice of the causal lags to the target variable
         lags_causal = self.lagfuncmit > csthreshold
+        nlag        = lags_causal.shape[2]
         for j in range(N):
-            pa_old = causalDict[j]
-            pa_new = []
+            pa_old = sorted(causalDict[j], key=lambda pa: pa[0])
             lags_causal_j = lags_causal[:,j,:]
-            for i in range(N):
-                pa_new_i = [(i,-l) for l, x in enumerate(lags_causal_j[i,:]) if x]
-                pa_new += intersection(pa_old, pa_new_i)
-            newcausalDict[j] = pa_new
+            newcausalDict[j] = [pa for pa in pa_old if 0 <= pa[0] < N and 0 <= -pa[1] < nlag and lags_causal_j[pa[0],-pa[1]]]
 
         if verbosity:
             print("")
@@ -195,7 +222,7 @@ class info_network(object):
         self.causalDict = newcausalDict
 
         # Update the network
-        self.network    = causal_network(causalDict, lagfuncs, taumax)
+        self.network    = causal_network(newcausalDict, lagfuncs, taumax)
         self.nnode      = self.network.nnodes
 
         # Update the lag functions (coupling strengths)
@@ -273,42 +300,27 @@ class info_network(object):
         self.lagfuncmit = np.zeros([N, N, lagmax+1])
         self.lagfuncmi  = np.zeros([N, N, lagmax+1])
 
-        # Compute MIT and MI
-        for i in range(N):
-            for j in range(N):
-                for l in range(lagmax+1):  # coupling strength X(i,-k) --> X(j,0)
-                    # Do not compute the 'self' coupling strength
-                    if i == j and l == 0: continue
-
-                    snode, tnode = (i,-l), (j,0)
-
-                    # Compute MI
-                    # Get data for node1 and node2
-                    data12 = reorganize_data(data, [snode, tnode])
-
-                    # Drop the rows with nan values
-                    data12n = dropna(data12)
+        # Get the condition for MIT of each coupling strength X(i,-k) --> X(j,0)
+        # Do not compute the 'self' coupling strength
+        couplings = [(i, j, l) for i in range(N) for j in range(N) for l in range(lagmax+1) if i != j or l != 0]
+        tasks     = [((i,-l), (j,0), self.network.search_mit_condition((i,-l), (j,0))) for i, j, l in couplings]
 
-                    # Calculate the mutual information of them
-                    if approach in kde_approaches:
-                        self.lagfuncmi[i,j,l] = computeMI(data=data12n, approach=approach, kernel=kernel, base=base)
-                    elif approach in knn_approaches:
-                        self.lagfuncmi[i,j,l] = computeMIKNN(data=data12n, k=k) / np.log(base)
-
-                    # Compute MIT
-                    # Get the condition for MIT
-                    conditionset = self.network.search_mit_condition(snode, tnode)
-                    # Get data for node1 and node2
-                    data12cond = reorganize_data(data, [snode, tnode]+conditionset)
-
-                    # Drop the rows with nan values
-                    data12condn = dropna(data12cond)
+        # Compute MIT and MI, which are independent among the coupling strengths
+        if self.nprocess > 1 and approach in kde_approaches_p + knn_approaches_p:
+            pool    = Pool(processes=self.nprocess, initializer=_initLagfunctionWorker,
+                           initargs=(data, approach, kernel, k, base))
+            try:
+                results = pool.map(_computeLagfunctionWorker, tasks)
+                pool.close()
+                pool.join()
+            finally:
+                pool.terminate()
+        else:
+            results = [computeLagfunction(snode, tnode, conditionset, data, approach, kernel, k, base)
+                       for snode, tnode, conditionset in tasks]
 
-                    # Calculate the conditional mutual information of them
-                    if approach in kde_approaches:
-                        self.lagfuncmit[i,j,l] = computeCMI(data=data12condn, approach=approach, kernel=kernel, base=base)
-                    elif approach in knn_approaches:
-                        self.lagfuncmit[i,j,l] = computeCMIKNN(data=data12condn, k=k) / np.log(base)
+        for (i, j, l), (mi, mit) in zip(couplings, results):
+            self.lagfuncmi[i,j,l], self.lagfuncmit[i,j,l] = mi, mit
 
     def compute_total_infotrans(self, target_ind, sst=False, verbosity=1):
         """
@@ -321,8 +333,6 @@ class info_network(object):
         data    = self.data
         network = self.network
         base    = self.base
-        approach = self.approach
-        kernel = self.kernel
         k      = self.k
         causalDict = self.causalDict
         nvar   = self.nvar
@@ -343,8 +353,7 @@ class info_network(object):
         inforesult = computeMIKNN(data1, k=k, xyindex=[1]) / np.log(base)
 
         if sst:
-            sstresult = independenceSet(target, pt, data=data,
-                                        approach=approach, k=k, kernel=kernel, base=base)
+            sstresult = self.__sst(independenceSet, target, pt)
             return inforesult, sstresult
 
         return inforesult
@@ -363,8 +372,6 @@ class info_network(object):
         data    = self.data
         network = self.network
         base    = self.base
-        approach = self.approach
-        kernel = self.kernel
         k      = self.k
         causalDict = self.causalDict
         nvar   = self.nvar
@@ -399,8 +406,7 @@ class info_network(object):
             inforesult = computeMIKNN(data1, k=k, xyindex=[1]) / np.log(base)
 
             if sst:
-                sstresult = independenceSet(target, pts, data=data,
-                                            approach=approach, k=k, kernel=kernel, base=base)
+                sstresult = self.__sst(independenceSet, target, pts)
                 return inforesult, sstresult
 
             return inforesult
@@ -420,8 +426,7 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            sstresult = conditionalIndependenceSet(target, pts, conditionset=w, data=data,
-                                                   approach=approach, k=k, kernel=kernel, base=base)
+            sstresult = self.__sst(conditionalIndependenceSet, target, pts, conditionset=w)
             return inforesult, sstresult
 
         return inforesult
@@ -458,7 +463,7 @@ class info_network(object):
                               kernel=kernel, k=k, base=base, conditioned=False)
             # Conduct the significance test if required
             if sst:
-                sstresult = independence(target, source, data=data, approach=approach, k=k, kernel=kernel, base=base)
+                sstresult = self.__sst(independence, target, source)
                 return inforesult, sstresult
 
             return inforesult
@@ -490,8 +495,7 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            sstresult = conditionalIndependence(target, source, conditionset=w, data=data,
-                                                approach=approach, k=k, kernel=kernel, base=base)
+            sstresult = self.__sst(conditionalIndependence, target, source, conditionset=w)
             return inforesult, sstresult
 
         return inforesult
@@ -567,8 +571,6 @@ class info_network(object):
         base    = self.base
         data    = self.data
         k       = self.k
-        approach = self.approach
-        kernel  = self.kernel
 
         # If not conditioned, just compute the normal information metrics (not the momentary one)
         if not conditioned:
@@ -580,8 +582,7 @@ class info_network(object):
             tit = computeMIKNN(data_required, k=k, xyindex=[1]) / np.log(base)        # distant causal history
             # Conduct the significance test if required
             if sst:
-                ssttit = independenceSet(target, sources, data=data,
-                                         approach=approach, k=k, kernel=kernel, base=base)
+                ssttit = self.__sst(independenceSet, target, sources)
                 return tit, ssttit
 
             return tit
@@ -611,8 +612,7 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            sstmitp = conditionalIndependenceSet(target, srcc, conditionset=w, data=data,
-                                                 approach=approach, k=k, kernel=kernel, base=base)
+            sstmitp = self.__sst(conditionalIndependenceSet, target, srcc, conditionset=w)
             return mitp, sstmitp
 
         return mitp
@@ -628,8 +628,6 @@ class info_network(object):
         base    = self.base
         data    = self.data
         k       = self.k
-        approach = self.approach
-        kernel  = self.kernel
 
         npts, nvar = data.shape
 
@@ -643,8 +641,7 @@ class info_network(object):
             tit = computeMIKNN(data_required, k=k, xyindex=[1]) / np.log(base)        # distant causal history
             # Conduct the significance test if required
             if sst:
-                ssttit = independenceSet(target, sources, data=data,
-                                         approach=approach, k=k, kernel=kernel, base=base)
+                ssttit = self.__sst(independenceSet, target, sources)
                 return tit, ssttit
 
             return tit
@@ -672,8 +669,7 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            sstmitp = conditionalIndependenceSet(target, srcc, conditionset=w, data=data,
-                                                 approach=approach, k=k, kernel=kernel, base=base)
+            sstmitp = self.__sst(conditionalIndependenceSet, target, srcc, conditionset=w)
             return mitp, sstmitp
 
         return mitp
@@ -988,7 +984,6 @@ class info_network(object):
         data    = self.data
         k       = self.k
         approach = self.approach
-        kernel  = self.kernel
         causalApprox = self.causalApprox
 
         result = {}
@@ -1112,12 +1107,9 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            ssttit = independenceSet(target, pt, data=data,
-                                     approach=approach, k=k, kernel=kernel, base=base)
-            sstcit = conditionalIndependenceSet(target, ptc, conditionset=w, data=data,
-                                                approach=approach, k=k, kernel=kernel, base=base)
-            sstpast = independenceSet(target, w, data=data,
-                                      approach=approach, k=k, kernel=kernel, base=base)
+            ssttit = self.__sst(independenceSet, target, pt)
+            sstcit = self.__sst(conditionalIndependenceSet, target, ptc, conditionset=w)
+            sstpast = self.__sst(independenceSet, target, w)
 
             result['sst'] = {'tit':sstit, 'cit': sstcit, 'past': sstpast}
 
@@ -1137,7 +1129,6 @@ class info_network(object):
         data    = self.data
         k       = self.k
         approach = self.approach
-        kernel  = self.kernel
 
         result = {}
 
@@ -1219,12 +1210,9 @@ class info_network(object):
 
         # Conduct the significance test if required
         if sst:
-            ssttit = independenceSet(target, pt, data=data,
-                                     approach=approach, k=k, kernel=kernel, base=base)
-            sstcit = conditionalIndependenceSet(target, ptc, conditionset=w, data=data,
-                                                approach=approach, k=k, kernel=kernel, base=base)
-            sstpast = independenceSet(target, w, data=data,
-                                      approach=approach, k=k, kernel=kernel, base=base)
+            ssttit = self.__sst(independenceSet, target, pt)
+            sstcit = self.__sst(conditionalIndependenceSet, target, ptc, conditionset=w)
+            sstpast = self.__sst(independenceSet, target, w)
             result['sst'] = {'tit': ssttit, 'cit':sstcit, 'past': sstpast}
             # return cit, sstcit, past, sstpast, tit, ssttit
 
@@ -1277,8 +1265,6 @@ class info_network(object):
         data    = self.data
         network = self.network
         base    = self.base
-        approach = self.approach
-        kernel = self.kernel
         k      = self.k
         nvar   = self.nvar
 
@@ -1297,8 +1283,7 @@ class info_network(object):
                 data_required = dropna(data_required)
                 # Compute the total information
                 if sst:
-                    sstresults[i,j]  = independence(varx, vary, data=data,
-                                                    approach=approach, k=k, kernel=kernel, base=base)
+                    sstresults[i,j]  = self.__sst(independence, varx, vary)
                     inforesults[i,j] = computeMIKNN(data_required, k=k) / np.log(base) # immediate causal history
                     sstresults[j,i] = sstresults[i,j]
                 else:
@@ -1323,8 +1308,6 @@ class info_network(object):
         data    = self.data
         network = self.network
         base    = self.base
-        approach = self.approach
-        kernel = self.kernel
         k      = self.k
         nvar   = self.nvar
 
@@ -1344,8 +1327,7 @@ class info_network(object):
                 data_required = dropna(data_required)
                 # Compute the total information
                 if sst:
-                    sstresults[src,tar]  = conditionalIndependence(tarnode, srcnode, conditionset=[w], data=data,
-                                                               approach=approach, k=k, kernel=kernel, base=base)
+                    sstresults[src,tar]  = self.__sst(conditionalIndependence, tarnode, srcnode, conditionset=[w])
                     inforesults[src,tar] = computeCMIKNN(data_required, k=k, xyindex=[1,2]) / np.log(base) # immediate causal history sstresults[tar,src] = sstresults[src,tar]
                 else:
                     inforesults[src,tar] = computeCMIKNN(data_required, k=k, xyindex=[1,2]) / np.log(base) # immediate causal history
@@ -1809,7 +1791,6 @@ class info_network(object):
         network = self.network
         networko = self.originalNetwork
         approach = self.approach
-        kernel  = self.kernel
         k       = self.k
         causalApprox = self.causalApprox
 
@@ -1977,8 +1958,7 @@ class info_network(object):
 
             # Conduct sst for past
             if sst:
-                sstpastset[i,:] = independenceSet(target, w, data=data, returnTrue=True,
-                                                  approach=approach, k=k, kernel=kernel, base=base)
+                sstpastset[i,:] = self.__sst(independenceSet, target, w, returnTrue=True)
                 # print sstpastset[i,:]
 
             # Conduct PID for past
@@ -2046,7 +2026,6 @@ class info_network(object):
         data    = self.data
         base    = self.base
         approach = self.approach
-        kernel  = self.kernel
         k       = self.k
 
         result = {}
@@ -2132,8 +2111,7 @@ class info_network(object):
 
             # Conduct sst for past
             if sst:
-                sstpastset[i,:] = independenceSet(target, w, data=data, returnTrue=True,
-                                                  approach=approach, k=k, kernel=kernel, base=base)
+                sstpastset[i,:] = self.__sst(independenceSet, target, w, returnTrue=True)
                 # print sstpastset[i,:]
 
             # Conduct PID for past
@@ -2185,6 +2163,53 @@ class info_network(object):
 
         return result
 
-def intersection(lst1, lst2):
-    lst3 = [value for value in lst1 if value in lst2]
-    return lst3
+def computeLagfunction(snode, tnode, conditionset, data, approach, kernel='gaussian', k=5, base=np.e):
+    """
+    Compute the mutual information and the momentary information transfer from snode to tnode.
+
+    Input:
+    snode        -- the source node with format (index, tau) [tuple]
+    tnode        -- the target node with format (index, tau) [tuple]
+    conditionset -- the condition set of MIT with format [(index, tau)] [list of tuples]
+    data         -- the data [numpy array with shape (npoints, ndim)]
+    approach     -- the selected approach for computing PDF [string]
+    kernel       -- the kernel type [str]
+    k            -- the number of nearest neighbor in knn-based informaiton-theoretic measure estimation [int]
+    base         -- the logrithmatic base [float]
+    Output:
+    mi, mit      -- the mutual information and the momentary information transfer [float]
+
+    """
+    mi, mit = 0., 0.
+
+    # Get data for node1 and node2 and drop the rows with nan values
+    data12n     = dropna(reorganize_data(data, [snode, tnode]))
+    data12condn = dropna(reorganize_data(data, [snode, tnode]+conditionset))
+
+    # Calculate the mutual information and the conditional mutual information of them
+    if approach in kde_approaches:
+        mi  = computeMI(data=data12n, approach=approach, kernel=kernel, base=base)
+        mit = computeCMI(data=data12condn, approach=approach, kernel=kernel, base=base)
+    elif approach in knn_approaches:
+        mi  = computeMIKNN(data=data12n, k=k) / np.log(base)
+        mit = computeCMIKNN(data=data12condn, k=k) / np.log(base)
+
+    return mi, mit
+
+
+# The data and the estimator settings shared by the worker processes of generate_lagfunctions()
+_lagfunctionWorkerArgs = ()
+
+
+def _initLagfunctionWorker(data, approach, kernel, k, base):
+    global _lagfunctionWorkerArgs
+    _lagfunctionWorkerArgs = (data, approach, kernel, k, base)
+
+    # Keep numexpr single-threaded since the cores are already used by the worker processes
+    if ne is not None:
+        ne.set_num_threads(1)
+
+
+def _computeLagfunctionWorker(task):
+    snode, tnode, conditionset = task
+    return computeLagfunction(snode, tnode, conditionset, *_lagfunctionWorkerArgs)
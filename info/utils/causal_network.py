@@ -24,6 +24,7 @@ class causal_network()
 
 convert_nodes_to_listofset()
 get_node_number()
+get_node_numbers()
 is_neighbor()
 get_node_set()
 get_path_nodes_and_their_parents()
@@ -81,24 +82,20 @@ class causal_network(object):
         offset = lagfuncs.min() if lagfuncs.min() < 0 else 0
         lagfuncs -= offset
 
-        # Assign all the edges
-        for i in range(taumax+1):
-            gap           = nvar*i
-            involved_nodes = range(gap, gap+nvar)
-            for j in range(nvar):
-                end = involved_nodes[j]
-                for parent in causalDict[j]:
-                    we = lagfuncs[parent[0], j, abs(parent[1])]
-                    # Add the edge
-                    start = get_node_number(parent, nvar, gap)
-                    if start < nnodes:
-                        g.add_edge(start, end, weight=we)
-
-        # Assign the weights
+        # Assign all the edges and their weights
+        # where each edge from a parent is moved along all the time lags at once
+        gaps    = nvar*np.arange(taumax+1)
         weights = np.zeros([nnodes, nnodes])
-        for (start, end) in g.edges():
-            if start < nnodes:
-                weights[start, end] = g[start][end]['weight']
+        for j in range(nvar):
+            for parent in causalDict[j]:
+                we = lagfuncs[parent[0], j, abs(parent[1])]
+                # Get the start and end nodes of the edge at all the time lags
+                starts = get_node_number(parent, nvar, 0) + gaps
+                ends   = j + gaps
+                starts, ends = starts[starts < nnodes], ends[starts < nnodes]
+                # Add the edges
+                g.add_weighted_edges_from(zip(starts.tolist(), ends.tolist(), [we]*len(starts)))
+                weights[starts, ends] = we
 
         self.var     = var
         self.nvar    = nvar
@@ -108,6 +105,12 @@ class causal_network(object):
         self.offset  = offset
         self.weights = weights
 
+        # Check whether the graph is acyclic (contemporaneous links, e.g., in both directions, can form cycles)
+        g.graph['acyclic'] = nx.is_directed_acyclic_graph(g)
+
+        # The node numbers in the graph, where the node (var_index, -lag) is nodenumbers[lag, var_index]
+        self.nodenumbers = np.arange(nnodes).reshape(taumax+1, nvar)
+
     def __check_node(self, target):
         """
         Check whether the target node is in the valid graph by fulfilling the following conditions:
@@ -228,8 +231,11 @@ class causal_network(object):
             return 'directed'
 
         # Check whether the link is a causal path or a contemporaneous sidepath
-        paths = self.search_causalpaths(source, target, nested=True, verbosity=verbosity)
-        if paths:
+        # (only the existence of a path matters, so the paths are not enumerated)
+        self.__check_node(source)
+        snode = get_node_number(source, self.nvar, 0)
+        tnode = get_node_number(target, self.nvar, 0)
+        if snode != tnode and nx.has_path(self.g, snode, tnode):
             return 'causalpath'
 
         # If none of them is found, return None
@@ -446,8 +452,8 @@ class causal_network(object):
                 srcs2.append(src)
 
         # Get the node numbers
-        s1nodes = [get_node_number(src, nvar, 0) for src in srcs1]
-        s2nodes = [get_node_number(src, nvar, 0) for src in srcs2]
+        s1nodes = get_node_numbers(srcs1, nvar, 0)
+        s2nodes = get_node_numbers(srcs2, nvar, 0)
         tnode   = get_node_number(target, nvar, 0)
 
         # Get the parents of the target node
@@ -519,12 +525,12 @@ class causal_network(object):
         self.__check_node(target)
 
         # Get the node number
-        snodes = [get_node_number(source, nvar, 0) for source in sources]
+        snodes = self.nodenumbers[tau, srcset].tolist()
         tnode  = get_node_number(target, nvar, 0)
 
         # Get all the nodes in the immediate causal history
-        ichlist = [(src,-i) for src in srcset for i in range(1,tau+1)]
-        ich     = [get_node_number(node, nvar, 0) for node in ichlist]
+        # i.e., [(src,-i) for src in srcset for i in range(1,tau+1)]
+        ich     = self.nodenumbers[1:tau+1, srcset].T.ravel().tolist()
 
         # Get the parents of the target node
         pt = get_parents_from_nodes(g, [tnode])
@@ -539,7 +545,7 @@ class causal_network(object):
 
         # Keep the nodes only in the distant causal history of srcset
         wlist = [node for node in wlist if node[1] < -tau and node[0] in srcset]
-        w = [get_node_number(node, nvar, 0) for node in wlist]
+        w = get_node_numbers(wlist, nvar, 0)
 
         # Conduct the weighted transitive reduction on w if required
         if transitive:
@@ -578,7 +584,7 @@ class causal_network(object):
         # Conduct the weighted transitive reduction on pptc and pw (level == 2) if required
         pwptclist = pwlist + pptclist
         if transitive and level >= 2:
-            pwptc = [get_node_number(node, nvar, 0) for node in pwptclist]
+            pwptc = get_node_numbers(pwptclist, nvar, 0)
             # Get the descendants/children of the pwptc
             pwptcchild = get_children_from_nodes(g, pwptc)
             # Get the intersection of the descendants and the immediate causal history & w
@@ -646,7 +652,7 @@ class causal_network(object):
             return []
 
         # Get the node number
-        snodes = [get_node_number(source, nvar, 0) for source in sourcesnew]
+        snodes = get_node_numbers(sourcesnew, nvar, 0)
         tnode  = get_node_number(target, nvar, 0)
 
         # Get the parents of the target node
@@ -715,31 +721,32 @@ class causal_network(object):
 
     def transitive_reduction(self, v1, v2, returnRemovedEdges=False):
         """Conduct the weighted transitive reduction for the edges from the set v1 to the set v2 in the original graph"""
+        # Get the number of nodes in v1 and v2
+        n1, n2 = len(v1), len(v2)
+
+        # No edge is between v1 and v2 if either of them is empty
+        if n1 == 0 or n2 == 0:
+            if returnRemovedEdges:
+                return [], []
+            else:
+                return []
+
         # Get the number of nodes and the weights
         nnodes  = self.nnodes
         g, nvar = self.g, self.nvar
         # weights = np.abs(np.copy(self.weights))
         weights = np.copy(self.weights)
         weightso= np.copy(self.weights)
-        v       = range(nnodes)
-
-        # Get the number of nodes in v1 and v2
-        n1, n2 = len(v1), len(v2)
 
-        # Get the indices of v1 and v2 in v
-        v1ind = [v.index(ele) for ele in v1]
-        v2ind = [v.index(ele) for ele in v2]
-        # v1ind, v2ind = np.where(v1==v), np.where(v2==v)
+        # Get the indices of v1 and v2 in the weight matrix (i.e., the node numbers themselves)
+        v1ind = list(v1)
+        v2ind = list(v2)
 
         # Conduct the weighted transitive reduction to get the revised weights
+        # where each step updates the whole weight matrix through the intermediate node k at once
         weights_new = np.copy(weights)
         for k in range(nnodes):
-            weights_old = np.copy(weights_new)
-            for i in range(nnodes):
-                for j in range(nnodes):
-                    we = weights_old[i,j]
-                    wek1, wek2 = weights_old[i,k], weights_old[k,j]
-                    weights_new[i,j] = max(we, min(wek1,wek2))
+            weights_new = np.maximum(weights_new, np.minimum(weights_new[:,[k]], weights_new[[k],:]))
 
         weights[weights_new > weights] = 0.
 
@@ -767,15 +774,9 @@ class causal_network(object):
                 v1remove.append(v1[i])
 
         if returnRemovedEdges:
-            edgeremove = []
-            for i in range(n1):
-                for j in range(n2):
-                    # we1 = weights[v1ind[i], v2ind[j]]
-                    we1 = weights_new[v1ind[i], v2ind[j]]
-                    we1o= weightso[v1ind[i], v2ind[j]]
-                    # if we1 < we1o:
-                    if we1 > we1o:
-                        edgeremove.append((v1[i],v2[j]))
+            v12ind = np.ix_(np.array(v1ind, dtype=int), np.array(v2ind, dtype=int))
+            rows, cols = np.nonzero(weights_new[v12ind] > weightso[v12ind])
+            edgeremove = [(v1[i],v2[j]) for i, j in zip(rows, cols)]
 
         # Return
         if returnRemovedEdges:
@@ -787,7 +788,10 @@ class causal_network(object):
 # Help functions
 def convert_nodes_to_listofset(nodes, nvar):
     '''Convert a list of nodes (in number) into a list of sets.'''
-    return [get_node_set(node, nvar) for node in nodes]
+    # Get the time lags and the variable indices of all the nodes at once
+    lags, nodeindices = np.divmod(np.array(list(nodes), dtype=int), nvar)
+
+    return list(zip(nodeindices.tolist(), (-lags).tolist()))
 
 
 def get_node_number(nodedict, nvar, lag):
@@ -795,13 +799,20 @@ def get_node_number(nodedict, nvar, lag):
     return nodedict[0] + lag + nvar*abs(nodedict[1])
 
 
+def get_node_numbers(nodedicts, nvar, lag):
+    '''Convert a list of nodes in set version to the node numbers in the graph.'''
+    nodedicts = np.array(list(nodedicts), dtype=int).reshape(-1, 2)
+
+    return (nodedicts[:,0] + lag + nvar*np.abs(nodedicts[:,1])).tolist()
+
+
 def get_node_set(nodenumber, nvar):
     '''Convert a node in number into a set (node index, time lag).'''
     # Get the variable index
     nodeindex = nodenumber % nvar
 
     # Get the time lag
-    lag = nodenumber / nvar
+    lag = nodenumber // nvar
 
     return (nodeindex, -lag)
 
@@ -821,21 +832,38 @@ def get_path_nodes_and_their_parents(g, snode, tnode):
 
 def get_causal_paths(g, snode, tnode, nested=True):
     '''Find the causal paths from the source node to the target node.'''
-    # Get all the path from snode to tnode
-    pathall = nx.all_simple_paths(g, snode, tnode)
-
     # Distinguish the causal paths from pathall
     if nested:
+        # Get all the path from snode to tnode
+        pathall = nx.all_simple_paths(g, snode, tnode)
+
         causalpaths = [p for p in pathall]
 
         return causalpaths
 
+    # Check whether the graph is acyclic if it is not recorded in the graph
+    acyclic = g.graph.get('acyclic')
+    if acyclic is None:
+        acyclic = nx.is_directed_acyclic_graph(g)
+
+    if not acyclic:
+        # Contemporaneous links in both directions form cycles, where a node can be both
+        # a descendant of the source and an ancestor of the target without being on a simple path
+        pathall = nx.all_simple_paths(g, snode, tnode)
+
+        # Exclude the target node and convert the paths to a list of nodes
+        causalpaths_final = unique([node for path in pathall for node in path[:-1]])
+
+        return causalpaths_final
+
     else:
-        # Exclude the target node
-        causalpaths_notarget = [p[:-1] for p in pathall]
+        # In an acyclic graph, the nodes in the causal paths (excluding the target node)
+        # are the source node and its descendants which are also the ancestors of the target node
+        ancestors = nx.ancestors(g, tnode)
+        if snode == tnode or snode not in ancestors:
+            return []
 
-        # Convert the paths to a list of nodes
-        causalpaths_final = unique([node for path in causalpaths_notarget for node in path])
+        causalpaths_final = list((nx.descendants(g, snode) & ancestors) | set([snode]))
 
         return causalpaths_final
 
@@ -882,7 +910,8 @@ def union(alist):
 
 def exclude_intersection(a, b):
     """ return the subset of a which does not belong to b."""
-    return [e for e in a if e not in intersect(a, b)]
+    b = set(b)
+    return [e for e in a if e not in b]
 
 
 # def convert_causalDict_to_int(causalDict):
@@ -259,7 +259,8 @@ def union(alist):
 
 def exclude_intersection(a, b):
     """ return the subset of a which does not belong to b."""
-    return [e for e in a if e not in intersect(a, b)]
+    b = set(b)
+    return [e for e in a if e not in b]
 
 
 # def convert_causalDict_to_int(causalDict):
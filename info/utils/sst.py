@@ -6,6 +6,7 @@ A function for conducting the statistical significance test on the mutual inform
 @Email:  shixijps@gmail.com
 
 shuffle()
+getShuffleInvariantEntropies()
 independence()
 conditionalIndependence()
 
@@ -65,6 +66,30 @@ def shuffle(data, shuffle_ind=[0], sstmethod='traditional', comm=None):
     return data_shuffled
 
 
+def getShuffleInvariantEntropies(inforesult, data, shuffle_ind=[0], xyindex=[1]):
+    """
+    Get the entropies of an info object which are not changed by shuffling the first variable X.
+
+    Inputs:
+    inforesult  -- the info object computed from the original data with the KDE approach [info]
+    data        -- the original data points before dropping the nan values [numpy array with shape (npoints, ndim)]
+    shuffle_ind -- the list of indices for shuffle test [list]
+    xyindex     -- the xyindex used for computing inforesult [list]
+
+    """
+    # Only X is permuted, so the entropies either without X or of X alone are unchanged,
+    # unless dropping the nan values after shuffling removes different samples
+    if list(shuffle_ind) != [0] or xyindex[0] != 1 or np.isnan(data).any():
+        return {}
+
+    if inforesult.conditioned:
+        names = ['hx', 'hy', 'hw', 'hyw']
+    else:
+        names = ['hx', 'hy']
+
+    return dict((name, getattr(inforesult, name)) for name in names)
+
+
 def independence(node1, node2, data, shuffle_ind=[0], ntest=100, alpha=0.05,  approach='kde_cuda_general',
                  bandwidth='silverman', sstmethod='traditional', kernel='gaussian',  # Parameters for KDE
                  k=5,                                                                # Parameters for KNN
@@ -93,9 +118,12 @@ def independence(node1, node2, data, shuffle_ind=[0], ntest=100, alpha=0.05,  ap
     data12n = dropna(data12)
 
     # Calculate the mutual information of them
+    marginals = {}
     if approach in kde_approaches:
-        mi = info(case=2, data=data12n, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                  base=base, xyindex=xyindex, conditioned=False).ixy
+        miresult = info(case=2, data=data12n, approach=approach, kernel=kernel, bandwidth=bandwidth,
+                        base=base, xyindex=xyindex, conditioned=False)
+        mi = miresult.ixy
+        marginals = getShuffleInvariantEntropies(miresult, data12, shuffle_ind, xyindex)
         # mi = computeMI(data=data12n, approach=approach, xyindex=xyindex, kernel=kernel, base=base)
     elif approach in knn_approaches:
         mi = computeMIKNN(data=data12n, k=k, xyindex=xyindex)
@@ -112,7 +140,7 @@ def independence(node1, node2, data, shuffle_ind=[0], ntest=100, alpha=0.05,  ap
        # Calculate the corresponding mi
         if approach in kde_approaches:
             mi_shuffled = info(case=2, data=data12n_shuffled, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                               base=base, xyindex=xyindex, conditioned=False).ixy
+                               base=base, xyindex=xyindex, conditioned=False, marginals=marginals).ixy
             #0 mi_shuffled = computeMI(data=data12n_shuffled, approach=approach, xyindex=xyindex, kernel=kernel, base=base)
         elif approach in knn_approaches:
             mi_shuffled = computeMIKNN(data=data12n_shuffled, k=k, xyindex=xyindex)
@@ -167,9 +195,12 @@ def independenceSet(node1, node2set, data, shuffle_ind=[0], ntest=100, alpha=0.0
     data12n = dropna(data12)
 
     # Calculate the mutual information of them
+    marginals = {}
     if approach in kde_approaches:
-        mi = info(case=2, data=data12n, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                  base=base, xyindex=xyindex, conditioned=False).ixy
+        miresult = info(case=2, data=data12n, approach=approach, kernel=kernel, bandwidth=bandwidth,
+                        base=base, xyindex=xyindex, conditioned=False)
+        mi = miresult.ixy
+        marginals = getShuffleInvariantEntropies(miresult, data12, shuffle_ind, xyindex)
         # mi = computeMI(data=data12n, approach=approach, xyindex=xyindex, kernel=kernel, base=base)
     elif approach in knn_approaches:
         mi = computeMIKNN(data=data12n, k=k, xyindex=xyindex)
@@ -186,7 +217,7 @@ def independenceSet(node1, node2set, data, shuffle_ind=[0], ntest=100, alpha=0.0
        # Calculate the corresponding mi
         if approach in kde_approaches:
             mi_shuffled = info(case=2, data=data12n_shuffled, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                               base=base, xyindex=xyindex, conditioned=False).ixy
+                               base=base, xyindex=xyindex, conditioned=False, marginals=marginals).ixy
             # mi_shuffled = computeMI(data=data12n_shuffled, approach=approach, xyindex=xyindex, kernel=kernel, base=base)
         elif approach in knn_approaches:
             mi_shuffled = computeMIKNN(data=data12n_shuffled, k=k, xyindex=xyindex)
@@ -240,9 +271,12 @@ def conditionalIndependence(node1, node2, conditionset, data, shuffle_ind=[0], n
     data12condn = dropna(data12cond)
 
     # Calculate the conditional mutual information of them
+    marginals = {}
     if approach in kde_approaches:
-        cmi = info(case=2, data=data12condn, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                   base=base, xyindex=xyindex, conditioned=True).ixy_w
+        cmiresult = info(case=2, data=data12condn, approach=approach, kernel=kernel, bandwidth=bandwidth,
+                         base=base, xyindex=xyindex, conditioned=True)
+        cmi = cmiresult.ixy_w
+        marginals = getShuffleInvariantEntropies(cmiresult, data12cond, shuffle_ind, xyindex)
         # cmi = computeCMI(data=data12condn, approach=approach, kernel=kernel, base=base)
     elif approach in knn_approaches:
         cmi = computeCMIKNN(data=data12condn, k=k, xyindex=xyindex)
@@ -259,7 +293,7 @@ def conditionalIndependence(node1, node2, conditionset, data, shuffle_ind=[0], n
        # Calculate the corresponding cmi
         if approach in kde_approaches:
             cmi_shuffled = info(case=2, data=data12condn_shuffled, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                                base=base, xyindex=xyindex, conditioned=True).ixy_w
+                                base=base, xyindex=xyindex, conditioned=True, marginals=marginals).ixy_w
             # cmi_shuffled = computeCMI(data=data12condn_shuffled, approach=approach, kernel=kernel, base=base)
         elif approach in knn_approaches:
             cmi_shuffled = computeCMIKNN(data=data12condn_shuffled, k=k, xyindex=xyindex)
@@ -316,9 +350,12 @@ def conditionalIndependenceSet(node1, node2set, conditionset, data, shuffle_ind=
     data12condn = dropna(data12cond)
 
     # Calculate the conditional mutual information of them
+    marginals = {}
     if approach in kde_approaches:
-        cmi = info(case=2, data=data12condn, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                   base=base, xyindex=xyindex, conditioned=True).ixy_w
+        cmiresult = info(case=2, data=data12condn, approach=approach, kernel=kernel, bandwidth=bandwidth,
+                         base=base, xyindex=xyindex, conditioned=True)
+        cmi = cmiresult.ixy_w
+        marginals = getShuffleInvariantEntropies(cmiresult, data12cond, shuffle_ind, xyindex)
         # cmi = computeCMI(data=data12condn, approach=approach, kernel=kernel, base=base)
     elif approach in knn_approaches:
         cmi = computeCMIKNN(data=data12condn, k=k, xyindex=xyindex)
@@ -335,7 +372,7 @@ def conditionalIndependenceSet(node1, node2set, conditionset, data, shuffle_ind=
        # Calculate the corresponding cmi
         if approach in kde_approaches:
             cmi_shuffled = info(case=2, data=data12condn_shuffled, approach=approach, kernel=kernel, bandwidth=bandwidth,
-                                base=base, xyindex=xyindex, conditioned=True).ixy_w
+                                base=base, xyindex=xyindex, conditioned=True, marginals=marginals).ixy_w
             # cmi_shuffled = computeCMI(data=data12condn_shuffled, approach=approach, kernel=kernel, base=base)
         elif approach in knn_approaches:
             cmi_shuffled = computeCMIKNN(data=data12condn_shuffled, k=k, xyindex=xyindex)